@@ -658,6 +658,8 @@ class CAT(object):
             if checkpoint is not None and checkpoint.steps is not None and latest_trained_step % checkpoint.steps == 0:
                 checkpoint.save(cdb=self.cdb, count=latest_trained_step)
 
+        if checkpoint is not None:
+            checkpoint.close()
         self.config.linking.train = False
 
     def add_cui_to_group(self, cui: str, group_name: str) -> None:
@@ -967,6 +969,8 @@ class CAT(object):
                                                                                use_groups=use_groups,
                                                                                extra_cui_filter=extra_cui_filter)
 
+        if checkpoint is not None:
+            checkpoint.close()
         # Set the filters again
         self.config.linking.filters = _filters
 
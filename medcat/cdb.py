@@ -5,7 +5,7 @@ import json
 import logging
 import aiofiles
 import numpy as np
-from typing import Dict, Set, Optional, List, Union, cast
+from typing import BinaryIO, Dict, Set, Optional, List, Union, cast
 from functools import partial
 
 from medcat import __version__
@@ -378,11 +378,20 @@ class CDB(object):
                 Path to a file where the model will be saved
         '''
         with open(path, 'wb') as f:
-            # No idea how to this correctly
-            to_save = {}
-            to_save['config'] = self.config.asdict()
-            to_save['cdb'] = {k:v for k,v in self.__dict__.items() if k != 'config'}
-            dill.dump(to_save, f)
+            self.dump(f)
+
+    def dump(self, f: BinaryIO) -> None:
+        r''' Serialises the model into an open binary file object, in the same format as `save`.
+
+        Args:
+            f (`BinaryIO`):
+                A file object (or in-memory buffer) opened for writing bytes
+        '''
+        # No idea how to this correctly
+        to_save = {}
+        to_save['config'] = self.config.asdict()
+        to_save['cdb'] = {k:v for k,v in self.__dict__.items() if k != 'config'}
+        dill.dump(to_save, f)
 
     async def save_async(self, path: str) -> None:
         r''' Async version of saving model to file (in fact it saves variables of this class).
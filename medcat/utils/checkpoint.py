@@ -1,10 +1,14 @@
 import os
 import logging
 import time
+import functools
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Tuple, Optional, TypeVar, Type
+from io import BytesIO
+from typing import Deque, List, Tuple, Optional, TypeVar, Type
 from medcat.cdb import CDB
-from medcat.utils.decorators import check_positive
+from medcat.utils.hasher import Hasher
 
 T = TypeVar("T", bound="Checkpoint")
 
@@ -27,14 +31,29 @@ class Checkpoint(object):
     """
     DEFAULT_STEP = 1000
     DEFAULT_MAX_TO_KEEP = 1
+    WRITE_CHUNK_SIZE = 16 * 1024 * 1024
+    TMP_FILE_NAME = ".checkpoint.tmp"
+
+    __slots__ = ("_dir_path", "_steps", "_max_to_keep", "_file_paths", "_count",
+                 "_writer", "_pending_save", "_pending_rollback", "_buffer", "_last_fingerprint",
+                 "_dir_mtime_ns")
 
-    @check_positive
     def __init__(self, dir_path: str, *, steps: int = DEFAULT_STEP, max_to_keep: int = DEFAULT_MAX_TO_KEEP) -> None:
+        if isinstance(steps, int) and steps < 1:
+            raise ValueError("Argument 'steps' is not a positive integer")
+        if isinstance(max_to_keep, int) and max_to_keep < 1:
+            raise ValueError("Argument 'max_to_keep' is not a positive integer")
         self._dir_path = os.path.abspath(dir_path)
         self._steps = steps
         self._max_to_keep = max_to_keep
-        self._file_paths: List[str] = []
+        self._file_paths: Deque[str] = deque()
         self._count = 0
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._pending_save: Optional[Future] = None
+        self._pending_rollback: Optional[Tuple[str, int, List[str]]] = None
+        self._buffer = BytesIO()
+        self._last_fingerprint: Optional[str] = None
+        self._dir_mtime_ns: Optional[int] = None
         os.makedirs(self._dir_path, exist_ok=True)
 
     @property
@@ -43,7 +62,8 @@ class Checkpoint(object):
 
     @steps.setter
     def steps(self, value: int) -> None:
-        check_positive(lambda _: ...)(value)    # [https://github.com/python/mypy/issues/1362]
+        if isinstance(value, int) and value < 1:
+            raise ValueError("Argument at position 0 is not a positive integer")
         self._steps = value
 
     @property
@@ -52,7 +72,8 @@ class Checkpoint(object):
 
     @max_to_keep.setter
     def max_to_keep(self, value: int) -> None:
-        check_positive(lambda _: ...)(value)    # [https://github.com/python/mypy/issues/1362]
+        if isinstance(value, int) and value < 1:
+            raise ValueError("Argument at position 0 is not a positive integer")
         self._max_to_keep = value
 
     @property
@@ -76,15 +97,16 @@ class Checkpoint(object):
         '''
         if not os.path.isdir(dir_path):
             raise Exception("Checkpoints not found. You need to train from scratch.")
-        ckpt_file_paths = cls._get_ckpt_file_paths(dir_path)
-        if not ckpt_file_paths:
+        dir_mtime_ns = cls._get_mtime_ns(dir_path)
+        ckpts = cls._scan_ckpts(dir_path)
+        if not ckpts:
             raise Exception("Checkpoints not found. You need to train from scratch.")
-        latest_ckpt = ckpt_file_paths[-1]
-        steps, count = cls._get_steps_and_count(latest_ckpt)
+        steps, count, latest_ckpt = ckpts[-1]
 
         checkpoint = cls(dir_path, steps=steps)
-        checkpoint._file_paths = ckpt_file_paths
+        checkpoint._file_paths = deque(path for _, _, path in ckpts)
         checkpoint._count = count
+        checkpoint._dir_mtime_ns = dir_mtime_ns
         logger.info(f"Checkpoint loaded from {latest_ckpt}")
         return checkpoint
 
@@ -92,52 +114,189 @@ class Checkpoint(object):
         r'''
         Save the CDB as the latest checkpoint.
 
+        The CDB is serialised before this method returns but the file is written (and the
+        checkpoints beyond `max_to_keep` removed) on a background thread, so training can
+        carry on in the meantime. Call `flush` to wait for the write to finish, or `close`
+        to also stop the writer thread once checkpointing is done. If the CDB
+        has not changed since the previous save, the new checkpoint is hard-linked to the
+        previous file instead of being written again.
+
         Args:
             cdb (medcat.CDB):
                 The MedCAT CDB object to be checkpointed
             count (count):
                 The number of the finished steps
         '''
-        ckpt_file_path = os.path.join(os.path.abspath(self._dir_path), "checkpoint-%s-%s" % (self.steps, count))
+        self.flush()
+        if self._dir_mtime_ns is not None and self._get_mtime_ns(self._dir_path) != self._dir_mtime_ns:
+            # Changed by someone else since it was last scanned, so the next restore has to rescan
+            self._dir_mtime_ns = None
+        ckpt_file_path = os.path.join(self._dir_path, f"checkpoint-{self._steps}-{count}")
+        # The CDB keeps changing once training resumes, so it cannot be serialised on the writer thread.
+        # The staging buffer is overwritten in place, so its memory is reused across saves.
+        self._buffer.seek(0)
+        cdb.dump(self._buffer)
+        size = self._buffer.tell()
+        with self._buffer.getbuffer() as view, view[:size] as data:
+            hasher = Hasher()
+            hasher.update_bytes(data)
+            fingerprint = hasher.hexdigest()
+        link_from = None
+        if self._file_paths and fingerprint == self._last_fingerprint:
+            link_from = self._file_paths[-1]
+        self._last_fingerprint = fingerprint
+        to_remove = []
         while len(self._file_paths) >= self._max_to_keep:
-            to_remove = self._file_paths.pop(0)
-            os.remove(to_remove)
-        cdb.save(ckpt_file_path)
-        logger.debug("Checkpoint saved: %s", ckpt_file_path)
+            to_remove.append(self._file_paths.popleft())
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1)
+        self._pending_save = self._writer.submit(self._write_ckpt, ckpt_file_path, self._buffer, size, to_remove, link_from)
+        self._pending_rollback = (ckpt_file_path, self._count, to_remove)
         self._file_paths.append(ckpt_file_path)
         self._count = count
 
+    def flush(self) -> None:
+        r'''
+        Wait for the checkpoint being written in the background (if any) to be on disk.
+        Errors raised while writing it are re-raised here, after the failed checkpoint has
+        been forgotten so `count` and the latest checkpoint go back to the last successful
+        save (old checkpoints are only removed once the new one is in place).
+        '''
+        if self._pending_save is not None:
+            pending_save, self._pending_save = self._pending_save, None
+            pending_rollback, self._pending_rollback = self._pending_rollback, None
+            try:
+                pending_save.result()
+                if self._dir_mtime_ns is not None:
+                    self._dir_mtime_ns = self._get_mtime_ns(self._dir_path)
+            except Exception:
+                if pending_rollback is not None:
+                    ckpt_file_path, self._count, to_remove = pending_rollback
+                    if self._file_paths and self._file_paths[-1] == ckpt_file_path:
+                        self._file_paths.pop()
+                    self._file_paths.extendleft(reversed(to_remove))
+                # The fingerprint belongs to the failed checkpoint, so it must not be linked to by the next save
+                self._last_fingerprint = None
+                self._dir_mtime_ns = None
+                raise
+
+    def close(self) -> None:
+        r'''
+        Wait for the checkpoint being written in the background (if any), shut down the
+        writer thread and release the staging buffer. Errors raised while writing it are
+        re-raised here. A later `save` starts a new writer thread.
+        '''
+        try:
+            self.flush()
+        finally:
+            if self._writer is not None:
+                writer, self._writer = self._writer, None
+                writer.shutdown()
+            # The buffer holds a whole serialised CDB, which would otherwise live as long as this object
+            self._buffer = BytesIO()
+            self._last_fingerprint = None
+
     def restore_latest_cdb(self) -> CDB:
         r'''
         Restore the CDB from the latest checkpoint.
 
+        The checkpoint directory is only scanned if this object does not know about any
+        checkpoint files yet, or if the directory has been modified since it was last scanned
+        other than by `save` on this object: the ones loaded by `from_latest` or written by
+        `save` are kept in order of count, so the last one is always the latest.
+
         Returns:
             cdb (medcat.CDB):
                 The MedCAT CDB object
         '''
+        self.flush()
         if not os.path.isdir(self._dir_path):
             raise Exception("Checkpoints not found. You need to train from scratch.")
-        ckpt_file_paths = self._get_ckpt_file_paths(self._dir_path)
-        if not ckpt_file_paths:
-            raise Exception("Checkpoints not found. You need to train from scratch.")
-        latest_ckpt = ckpt_file_paths[-1]
-        _, count = self._get_steps_and_count(latest_ckpt)
-        self._file_paths = ckpt_file_paths
-        self._count = count
+        dir_mtime_ns = self._get_mtime_ns(self._dir_path)
+        if not self._file_paths or dir_mtime_ns != self._dir_mtime_ns:
+            ckpts = self._scan_ckpts(self._dir_path)
+            if not ckpts:
+                raise Exception("Checkpoints not found. You need to train from scratch.")
+            _, count, _ = ckpts[-1]
+            self._file_paths = deque(path for _, _, path in ckpts)
+            self._count = count
+            self._dir_mtime_ns = dir_mtime_ns
         return CDB.load(self._file_paths[-1])
 
     @staticmethod
-    def _get_ckpt_file_paths(dir_path: str) -> List[str]:
-        ckpt_file_paths = [os.path.abspath(os.path.join(dir_path, f)) for f in os.listdir(dir_path)]
-        ckpt_file_paths = [f for f in ckpt_file_paths if os.path.isfile(f) and "checkpoint-" in f]
-        if ckpt_file_paths:
-            ckpt_file_paths.sort(key=lambda f: Checkpoint._get_steps_and_count(f)[1])
-        return ckpt_file_paths
+    def _write_ckpt(ckpt_file_path: str, buffer: BytesIO, size: int, to_remove: List[str], link_from: Optional[str]) -> None:
+        if link_from is not None:
+            # Linked before the eviction below, which may be about to remove `link_from`
+            try:
+                os.link(link_from, ckpt_file_path)
+            except OSError:
+                logger.debug("Cannot link %s to %s, writing it instead", ckpt_file_path, link_from)
+                link_from = None
+        if link_from is None:
+            # Written under a name _scan_ckpts ignores and moved into place once complete,
+            # so an interrupted write never shows up as the latest checkpoint
+            tmp_file_path = os.path.join(os.path.dirname(ckpt_file_path), Checkpoint.TMP_FILE_NAME)
+            try:
+                Checkpoint._write_buffer(tmp_file_path, buffer, size)
+                os.replace(tmp_file_path, ckpt_file_path)
+            except BaseException:
+                try:
+                    os.remove(tmp_file_path)
+                except FileNotFoundError:
+                    pass
+                raise
+        # Only evict once the new checkpoint is in place, and never fail the save over it
+        for file_path in to_remove:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                logger.debug("Checkpoint already removed: %s", file_path)
+            except OSError:
+                logger.warning("Cannot remove old checkpoint: %s", file_path, exc_info=True)
+        logger.debug("Checkpoint saved: %s", ckpt_file_path)
+
+    @staticmethod
+    def _write_buffer(file_path: str, buffer: BytesIO, size: int) -> None:
+        # Views are released on the way out, even on errors, so the buffer can be resized by the next save
+        with buffer.getbuffer() as view, view[:size] as data, open(file_path, "wb") as f:
+            for offset in range(0, size, Checkpoint.WRITE_CHUNK_SIZE):
+                with data[offset:offset + Checkpoint.WRITE_CHUNK_SIZE] as chunk:
+                    f.write(chunk)
+                    if hasattr(os, "posix_fadvise"):
+                        # Start writeback of the chunk now rather than letting dirty pages pile up
+                        f.flush()
+                        os.posix_fadvise(f.fileno(), offset, chunk.nbytes, os.POSIX_FADV_DONTNEED)
+            if hasattr(os, "posix_fadvise"):
+                # Drop what has been written back so the checkpoint does not crowd out the page cache
+                f.flush()
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+    @staticmethod
+    def _get_mtime_ns(dir_path: str) -> Optional[int]:
+        try:
+            return os.stat(dir_path).st_mtime_ns
+        except OSError:
+            return None
 
     @staticmethod
+    def _scan_ckpts(dir_path: str) -> List[Tuple[int, int, str]]:
+        # scandir entries carry the file type from the directory listing, so is_file() needs no extra stat
+        ckpts = []
+        with os.scandir(os.path.abspath(dir_path)) as entries:
+            for entry in entries:
+                if "checkpoint-" in entry.name and entry.is_file():
+                    steps, count = Checkpoint._get_steps_and_count(entry.name)
+                    ckpts.append((steps, count, entry.path))
+        ckpts.sort(key=lambda ckpt: ckpt[1])
+        return ckpts
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
     def _get_steps_and_count(file_path) -> Tuple[int, int]:
-        file_name_parts = os.path.basename(file_path).split('-')
-        return int(file_name_parts[1]), int(file_name_parts[2])
+        # Both fields are at the end of "checkpoint-{steps}-{count}", so no basename/split is needed
+        rest, _, count = file_path.rpartition('-')
+        _, _, steps = rest.rpartition('-')
+        return int(steps), int(count)
 
 
 @dataclass
@@ -157,6 +316,8 @@ class CheckpointManager(object):
         checkpoint_config (medcat.utils.checkpoint.CheckpointConfig):
             The checkpoint config object.
     """
+    LATEST_LINK_NAME = "latest"
+
     def __init__(self, name: str, checkpoint_config: CheckpointConfig) -> None:
         self.name = name
         self.checkpoint_config = checkpoint_config
@@ -164,6 +325,8 @@ class CheckpointManager(object):
     def create_checkpoint(self, dir_path: Optional[str] = None) -> "Checkpoint":
         r'''
         Create a new checkpoint inside the checkpoint base directory.
+        If the new checkpoint directory is inside the base directory, the `latest` link in the
+        base directory is refreshed.
 
         Args:
             dir_path (str):
@@ -172,10 +335,14 @@ class CheckpointManager(object):
         Returns:
             A checkpoint object
         '''
-        dir_path = dir_path or os.path.join(os.path.abspath(os.getcwd()), self.checkpoint_config.output_dir, self.name, str(int(time.time())))
-        return Checkpoint(dir_path,
-                          steps=self.checkpoint_config.steps,
-                          max_to_keep=self.checkpoint_config.max_to_keep)
+        base_dir_path = os.path.join(os.path.abspath(os.getcwd()), self.checkpoint_config.output_dir, self.name)
+        dir_path = dir_path or os.path.join(base_dir_path, str(int(time.time())))
+        checkpoint = Checkpoint(dir_path,
+                                steps=self.checkpoint_config.steps,
+                                max_to_keep=self.checkpoint_config.max_to_keep)
+        if os.path.dirname(checkpoint.dir_path) == os.path.abspath(base_dir_path):
+            self._update_latest_link(base_dir_path)
+        return checkpoint
 
     def get_latest_checkpoint(self, base_dir_path: Optional[str] = None) -> "Checkpoint":
         r'''
@@ -199,6 +366,8 @@ class CheckpointManager(object):
     def get_latest_training_dir(cls, base_dir_path: str) -> str:
         r'''
         Retrieve the latest training directory containing all checkpoints.
+        The `latest` link is followed if the base directory has not changed since it was
+        written, otherwise the base directory is listed.
 
         Args:
             base_dir_path (string):
@@ -208,9 +377,40 @@ class CheckpointManager(object):
         '''
         if not os.path.isdir(base_dir_path):
             raise ValueError(f"Checkpoint folder passed in does not exist: {base_dir_path}")
-        ckpt_dir_paths = os.listdir(base_dir_path)
+        latest_link_path = os.path.join(base_dir_path, cls.LATEST_LINK_NAME)
+        try:
+            # The link is stamped with the base directory's mtime, so any directory added or
+            # removed since (by any MedCAT version) makes the two differ
+            if os.lstat(latest_link_path).st_mtime_ns == os.stat(base_dir_path).st_mtime_ns:
+                ckpt_dir_path = os.path.abspath(os.path.join(base_dir_path, os.readlink(latest_link_path)))
+                if os.path.isdir(ckpt_dir_path):
+                    return ckpt_dir_path
+        except OSError:
+            pass
+        ckpt_dir_path = os.path.abspath(os.path.join(base_dir_path, cls._list_latest_training_dir(base_dir_path)))
+        return ckpt_dir_path
+
+    @classmethod
+    def _list_latest_training_dir(cls, base_dir_path: str) -> str:
+        ckpt_dir_paths = [f for f in os.listdir(base_dir_path) if f != cls.LATEST_LINK_NAME and not f.startswith(".")]
         if not ckpt_dir_paths:
             raise ValueError("No existing training found")
         ckpt_dir_paths.sort()
-        ckpt_dir_path = os.path.abspath(os.path.join(base_dir_path, ckpt_dir_paths[-1]))
-        return ckpt_dir_path
+        return ckpt_dir_paths[-1]
+
+    @classmethod
+    def _update_latest_link(cls, base_dir_path: str) -> None:
+        tmp_link_path = os.path.join(base_dir_path, f".{cls.LATEST_LINK_NAME}.tmp")
+        latest_link_path = os.path.join(base_dir_path, cls.LATEST_LINK_NAME)
+        try:
+            latest_dir_name = cls._list_latest_training_dir(base_dir_path)
+            if os.path.lexists(tmp_link_path):
+                os.remove(tmp_link_path)
+            # A relative link keeps working if the base directory is moved; the rename replaces it atomically
+            os.symlink(latest_dir_name, tmp_link_path, target_is_directory=True)
+            os.replace(tmp_link_path, latest_link_path)
+            base_dir_mtime_ns = os.stat(base_dir_path).st_mtime_ns
+            os.utime(latest_link_path, ns=(base_dir_mtime_ns, base_dir_mtime_ns), follow_symlinks=False)
+        except (OSError, NotImplementedError):
+            # E.g. no symlink privilege on Windows, get_latest_training_dir will list the base directory instead
+            logger.debug("Cannot link the latest training in %s", base_dir_path)
@@ -52,6 +52,12 @@ class CDBTests(unittest.TestCase):
             self.undertest.save(f.name)
             self.undertest.load(f.name)
 
+    def test_dump_and_load(self):
+        with tempfile.NamedTemporaryFile() as f:
+            self.undertest.dump(f)
+            f.flush()
+            self.undertest.load(f.name)
+
     def test_save_async_and_load(self):
         with tempfile.NamedTemporaryFile() as f:
             asyncio.run(self.undertest.save_async(f.name))
@@ -1,8 +1,9 @@
 import os
+import errno
 import unittest
 import tempfile
 import json
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from tests.helper import AsyncMock
 from medcat.utils.checkpoint import Checkpoint, CheckpointConfig, CheckpointManager
 from medcat.cdb import CDB
@@ -32,18 +33,154 @@ class CheckpointTest(unittest.TestCase):
         self.assertEqual(5, checkpoint.max_to_keep)
         cdb_load.assert_called_with(os.path.abspath(os.path.join(dir_path, "checkpoint-2-20")))
 
+    @patch("medcat.cdb.CDB.load", return_value="cdb_object")
+    def test_restore_latest_cdb_without_rescan(self, cdb_load):
+        dir_path = os.path.join(os.path.dirname(__file__), "..", "resources", "checkpoints", "cat_train", "1643822916")
+        checkpoint = Checkpoint.from_latest(dir_path)
+
+        with patch.object(Checkpoint, "_scan_ckpts") as scan_ckpts:
+            cdb = checkpoint.restore_latest_cdb()
+
+        self.assertEqual("cdb_object", cdb)
+        self.assertEqual(20, checkpoint.count)
+        scan_ckpts.assert_not_called()
+        cdb_load.assert_called_with(os.path.abspath(os.path.join(dir_path, "checkpoint-2-20")))
+
+    @patch("medcat.cdb.CDB.load", return_value="cdb_object")
+    def test_restore_latest_cdb_rescans_modified_dir(self, cdb_load):
+        dir_path = tempfile.TemporaryDirectory()
+        with open(os.path.join(dir_path.name, "checkpoint-1-1"), "wb") as f:
+            f.write(b"first")
+        checkpoint = Checkpoint.from_latest(dir_path.name)
+        checkpoint.max_to_keep = 5
+        checkpoint.save(self._cdb(b"second"), 2)
+        checkpoint.flush()
+        with patch.object(Checkpoint, "_scan_ckpts", wraps=Checkpoint._scan_ckpts) as scan_ckpts:
+            checkpoint.restore_latest_cdb()
+        scan_ckpts.assert_not_called()
+        cdb_load.assert_called_with(os.path.join(dir_path.name, "checkpoint-1-2"))
+
+        # A newer checkpoint written by another process
+        with open(os.path.join(dir_path.name, "checkpoint-1-5"), "wb") as f:
+            f.write(b"newer")
+        os.utime(dir_path.name, ns=(0, 0))  # makes the change visible regardless of timestamp granularity
+        checkpoint.restore_latest_cdb()
+
+        cdb_load.assert_called_with(os.path.join(dir_path.name, "checkpoint-1-5"))
+        self.assertEqual(5, checkpoint.count)
+
     @patch("medcat.cdb.CDB")
     def test_save(self, cdb):
         dir_path = tempfile.TemporaryDirectory()
         checkpoint = Checkpoint(dir_path=dir_path.name, steps=1, max_to_keep=1)
 
         checkpoint.save(cdb, 1)
+        checkpoint.flush()
 
-        cdb.save.assert_called()
+        cdb.dump.assert_called()
+        self.assertTrue(os.path.isfile(os.path.join(dir_path.name, "checkpoint-1-1")))
         self.assertEqual(1, checkpoint.steps)
         self.assertEqual(1, checkpoint.max_to_keep)
         self.assertEqual(1, checkpoint.count)
 
+    @patch("medcat.cdb.CDB")
+    def test_save_removes_oldest(self, cdb):
+        dir_path = tempfile.TemporaryDirectory()
+        checkpoint = Checkpoint(dir_path=dir_path.name, steps=1, max_to_keep=2)
+
+        for count in range(1, 4):
+            checkpoint.save(cdb, count)
+        checkpoint.flush()
+
+        self.assertEqual(["checkpoint-1-2", "checkpoint-1-3"], sorted(os.listdir(dir_path.name)))
+        self.assertEqual(3, checkpoint.count)
+
+    @patch("medcat.cdb.CDB")
+    def test_save_tolerates_removed_checkpoint(self, cdb):
+        dir_path = tempfile.TemporaryDirectory()
+        checkpoint = Checkpoint(dir_path=dir_path.name, steps=1, max_to_keep=1)
+        checkpoint.save(cdb, 1)
+        checkpoint.flush()
+        os.remove(os.path.join(dir_path.name, "checkpoint-1-1"))
+
+        checkpoint.save(cdb, 2)
+        checkpoint.flush()
+
+        self.assertEqual(["checkpoint-1-2"], os.listdir(dir_path.name))
+        self.assertEqual(2, checkpoint.count)
+
+    def test_close(self):
+        dir_path = tempfile.TemporaryDirectory()
+        checkpoint = Checkpoint(dir_path=dir_path.name, steps=1, max_to_keep=2)
+
+        checkpoint.save(self._cdb(b"unchanged"), 1)
+        checkpoint.close()
+        self.assertTrue(os.path.isfile(os.path.join(dir_path.name, "checkpoint-1-1")))
+        self.assertEqual(0, len(checkpoint._buffer.getbuffer()))
+
+        checkpoint.save(self._cdb(b"unchanged"), 2)
+        checkpoint.close()
+        self.assertTrue(os.path.isfile(os.path.join(dir_path.name, "checkpoint-1-2")))
+        self.assertEqual(1, os.stat(os.path.join(dir_path.name, "checkpoint-1-2")).st_nlink)
+        self.assertEqual(2, checkpoint.count)
+
+    @patch("medcat.cdb.CDB")
+    def test_save_links_unchanged_cdb(self, cdb):
+        dir_path = tempfile.TemporaryDirectory()
+        checkpoint = Checkpoint(dir_path=dir_path.name, steps=1, max_to_keep=2)
+        cdb.dump.side_effect = lambda f: f.write(b"unchanged")
+
+        checkpoint.save(cdb, 1)
+        checkpoint.save(cdb, 2)
+        checkpoint.flush()
+
+        first = os.stat(os.path.join(dir_path.name, "checkpoint-1-1"))
+        second = os.stat(os.path.join(dir_path.name, "checkpoint-1-2"))
+        self.assertEqual(first.st_ino, second.st_ino)
+        self.assertEqual(2, checkpoint.count)
+
+    @patch("medcat.cdb.CDB.load", return_value="cdb_object")
+    def test_save_failure_is_rolled_back(self, cdb_load):
+        self._assert_save_failure_is_rolled_back(cdb_load, max_to_keep=5)
+
+    @patch("medcat.cdb.CDB.load", return_value="cdb_object")
+    def test_save_failure_keeps_only_checkpoint(self, cdb_load):
+        self._assert_save_failure_is_rolled_back(cdb_load, max_to_keep=1)
+
+    def _assert_save_failure_is_rolled_back(self, cdb_load, max_to_keep):
+        dir_path = tempfile.TemporaryDirectory()
+        checkpoint = Checkpoint(dir_path=dir_path.name, steps=1, max_to_keep=max_to_keep)
+
+        def failing_write(file_path, *args):
+            with open(file_path, "wb") as f:
+                f.write(b"partial")
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        checkpoint.save(self._cdb(b"first"), 1)
+        checkpoint.flush()
+        with patch.object(Checkpoint, "_write_buffer", side_effect=failing_write):
+            checkpoint.save(self._cdb(b"second"), 2)
+            with self.assertRaises(OSError):
+                checkpoint.flush()
+
+        self.assertEqual(1, checkpoint.count)
+        self.assertEqual(["checkpoint-1-1"], os.listdir(dir_path.name))
+        checkpoint.restore_latest_cdb()
+        cdb_load.assert_called_with(os.path.join(dir_path.name, "checkpoint-1-1"))
+
+        checkpoint.save(self._cdb(b"second"), 3)
+        checkpoint.flush()
+
+        with open(os.path.join(dir_path.name, "checkpoint-1-3"), "rb") as f:
+            self.assertEqual(b"second", f.read())
+        self.assertEqual(3, checkpoint.count)
+
+    @staticmethod
+    def _cdb(content):
+        cdb = MagicMock()
+        cdb.dump.side_effect = lambda f: f.write(content)
+        return cdb
+
     def test_validation_on_steps(self):
         with self.assertRaises(Exception) as e1:
             Checkpoint(dir_path="dir_path", steps=0, max_to_keep=1)
@@ -54,6 +191,14 @@ class CheckpointTest(unittest.TestCase):
             checkpoint.steps = 0
         self.assertEqual("Argument at position 0 is not a positive integer", str(e2.exception))
 
+    def test_validation_accepts_no_steps(self):
+        checkpoint = Checkpoint(dir_path=tempfile.TemporaryDirectory().name, steps=None, max_to_keep=1)
+        self.assertIsNone(checkpoint.steps)
+
+        checkpoint.steps = 1000
+        checkpoint.steps = None
+        self.assertIsNone(checkpoint.steps)
+
     def test_validation_on_max_to_keep(self):
         with self.assertRaises(Exception) as e1:
             Checkpoint(dir_path="dir_path", steps=1000, max_to_keep=-1)
@@ -79,6 +224,42 @@ class CheckpointTest(unittest.TestCase):
         self.assertEqual(0, checkpoint.count)
         self.assertEqual(5, checkpoint.max_to_keep)
 
+    def test_create_checkpoint_links_latest_training(self):
+        ckpt_out_dir_path = tempfile.TemporaryDirectory()
+        ckpt_config = {
+            'output_dir': ckpt_out_dir_path.name,
+            'steps': 1000,
+            "max_to_keep": 5,
+        }
+
+        checkpoint = CheckpointManager("cat_train", CheckpointConfig(**ckpt_config)).create_checkpoint()
+
+        base_dir_path = os.path.join(ckpt_out_dir_path.name, "cat_train")
+        self.assertTrue(os.path.islink(os.path.join(base_dir_path, CheckpointManager.LATEST_LINK_NAME)))
+        self.assertEqual(checkpoint.dir_path, CheckpointManager.get_latest_training_dir(base_dir_path))
+
+    def test_latest_training_with_explicit_and_generated_dirs(self):
+        ckpt_out_dir_path = tempfile.TemporaryDirectory()
+        ckpt_config = {
+            'output_dir': ckpt_out_dir_path.name,
+            'steps': 1000,
+            "max_to_keep": 5,
+        }
+        checkpoint_manager = CheckpointManager("cat_train", CheckpointConfig(**ckpt_config))
+        base_dir_path = os.path.join(ckpt_out_dir_path.name, "cat_train")
+
+        checkpoint_manager.create_checkpoint()
+        checkpoint = checkpoint_manager.create_checkpoint(dir_path=os.path.join(base_dir_path, "9999999999"))
+        self.assertEqual(checkpoint.dir_path, CheckpointManager.get_latest_training_dir(base_dir_path))
+
+        checkpoint_manager.create_checkpoint(dir_path=os.path.join(base_dir_path, "1"))
+        self.assertEqual(checkpoint.dir_path, CheckpointManager.get_latest_training_dir(base_dir_path))
+
+        # A training directory created without updating the link, e.g. by an older MedCAT
+        os.makedirs(os.path.join(base_dir_path, "99999999999"))
+        os.utime(base_dir_path, ns=(0, 0))  # makes the change visible regardless of timestamp granularity
+        self.assertEqual(os.path.join(base_dir_path, "99999999999"), CheckpointManager.get_latest_training_dir(base_dir_path))
+
     def test_get_latest_checkpoint(self):
         ckpt_out_dir_path = os.path.join(os.path.dirname(__file__), "..", "resources", "checkpoints", "cat_train_supervised")
         ckpt_config = {